@@ -1,18 +1,51 @@
-import os, yaml, pathlib, base64
-from urllib.parse import urljoin
+import os, re, sys, errno, json, yaml, pathlib, base64, contextlib, hashlib, pickle, functools, stat, gc, signal, socket, codecs
 
 import logging
+import anyio
 import httpx
+import orjson
 from mcp.server.fastmcp import FastMCP
 
+# Prefer the LibYAML bindings, they are several times faster than the pure Python implementation
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 ### Constants ###
 
 VERSION = "2025.09.03.141435"
 
-# Load OpenAPI spec
+# OpenAPI spec, loaded on first use since only the paths tools need it
 current_dir = pathlib.Path(__file__).parent
-with open(current_dir / 'redmine_openapi.yml') as f:
-    SPEC = yaml.safe_load(f)
+
+@functools.lru_cache(maxsize=1)
+def load_spec():
+    # Parsing the YAML is slow, so keep a pickled copy next to it keyed on the YAML content
+    raw = (current_dir / 'redmine_openapi.yml').read_bytes()
+    cache_path = current_dir / f"redmine_openapi.{hashlib.sha256(raw).hexdigest()[:16]}.pkl"
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        pass  # Missing, corrupt or written by an incompatible Python, parse the YAML instead
+
+    spec = yaml.load(raw, Loader=SafeLoader)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        for stale_path in current_dir.glob('redmine_openapi.*.pkl'):
+            if stale_path != cache_path:
+                stale_path.unlink(missing_ok=True)
+    except OSError:
+        pass  # Read-only install or full disk, just parse again next time
+    finally:
+        with contextlib.suppress(OSError):
+            tmp_path.unlink(missing_ok=True)  # Only left over if writing or renaming failed
+
+    return spec
 
 # Constants from environment
 REDMINE_URL = os.environ["REDMINE_URL"]
@@ -24,6 +57,12 @@ except Exception:
     REDMINE_REQUEST_INSTRUCTIONS = _rri_b64
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 
+# The log format doesn't include thread, process or asyncio task info, so don't collect it for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging.logAsyncioTasks = False  # Python 3.12+, a no-op before that
+
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL, logging.INFO),
     format="%(asctime)s | %(levelname)s | %(name)s | %(module)s:%(lineno)d | %(message)s",
@@ -35,72 +74,228 @@ MCP_AUTH_METHOD = os.environ.get("MCP_AUTH_METHOD")
 MCP_AUTH_TOKEN = os.environ.get("MCP_AUTH_TOKEN")
 MCP_AUTH_HEADER = os.environ.get("MCP_AUTH_HEADER", "X-MCP-Auth")
 
+# Shared HTTP client so connections to Redmine are pooled and kept alive between tool calls. HTTP/2 is
+# used when the server offers it, letting concurrent tool calls share one connection.
+_CLIENT = httpx.AsyncClient(base_url=REDMINE_URL, headers={'X-Redmine-API-Key': REDMINE_API_KEY},
+                            timeout=60.0, http2=True,
+                            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+
+# Attachments are streamed to and from disk in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+# Exit status of a forked worker whose server never started, it isn't restarted
+WORKER_STARTUP_FAILED = 3
+
+# HTTP methods accepted by redmine_request, request() expects them lowercased
+METHODS = {'get', 'post', 'put', 'patch', 'delete'}
+# Output formats accepted by redmine_request, anything else is reported as an error in YAML
+FORMATS = {'yaml', 'json'}
+
+class RawJSON(str):
+    """JSON text from a Redmine response that was passed through without decoding"""
 
 # Core
-def request(path: str, method: str = 'get', data: dict = None, params: dict = None,
-            content_type: str = 'application/json', content: bytes = None) -> dict:
-    headers = {'X-Redmine-API-Key': REDMINE_API_KEY, 'Content-Type': content_type}
-    url = urljoin(REDMINE_URL, path.lstrip('/'))
+async def request(path: str, method: str = 'get', data: dict = None, params: dict = None,
+                  content_type: str = 'application/json', content=None, extra_headers: dict = None,
+                  raw_json: bool = False) -> dict:
+    headers = {'Content-Type': content_type, **(extra_headers or {})}
+    url = path.lstrip('/')  # Resolved against REDMINE_URL by the client
 
     try:
-        response = httpx.request(method=method.lower(), url=url, json=data, params=params, headers=headers,
-                                 content=content, timeout=60.0)
+        response = await _CLIENT.request(method=method, url=url, json=data, params=params,
+                                         headers=headers, content=content)
         response.raise_for_status()
 
         body = None
         if response.content:
-            try:
-                body = response.json()
-            except ValueError:
-                body = response.content
+            text = raw_json_text(response) if raw_json else None
+            if text is not None:
+                body = RawJSON(text)
+            else:
+                try:
+                    body = parse_json(response.content)
+                except ValueError:
+                    body = response.content
 
         return {"status_code": response.status_code, "body": body, "error": ""}
+    except httpx.HTTPStatusError as e:
+        return error_response(e, e.response)
+    except httpx.RequestError as e:
+        return error_response(e)
     except Exception as e:
-        try:
-            status_code = e.response.status_code
-        except:
-            status_code = 0
+        logger.exception(f"Unexpected error in {method.upper()} {url}")
+        return error_response(e)
+
+async def download(path: str, save_path: str) -> dict:
+    url = path.lstrip('/')  # Resolved against REDMINE_URL by the client
+    # Written next to the target and moved into place only once the whole body arrived, so a failed
+    # download never truncates an existing file. Symlinks are followed so the link itself stays in place
+    target = os.path.realpath(save_path)
+    part_path = f"{target}.{os.getpid()}.{os.urandom(4).hex()}.part"
 
+    try:
+        # Checked up front so a missing directory isn't reported against the temporary file
+        if not os.path.isdir(os.path.dirname(target)):
+            raise FileNotFoundError(errno.ENOENT, "Directory does not exist", os.path.dirname(save_path))
         try:
-            body = e.response.json()
-        except:
-            try:
-                body = e.response.text
-            except:
-                body = None
+            mode = stat.S_IMODE(os.stat(target).st_mode)
+        except FileNotFoundError:
+            mode = None
+
+        async with _CLIENT.stream('get', url) as response:
+            if not response.is_success:
+                await response.aread()  # Make the error body available to error_response()
+            response.raise_for_status()
+
+            # Chunks go straight to the file descriptor, skipping the copy into a write buffer
+            async with await anyio.open_file(part_path, 'wb', buffering=0) as f:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    view = memoryview(chunk)
+                    while view:  # Unbuffered writes may be partial
+                        view = view[await f.write(view):]
+
+        if mode is not None:
+            os.chmod(part_path, mode)  # The replacement is a new file, keep the old one's permissions
+        os.replace(part_path, target)
+        return {"status_code": response.status_code, "body": None, "error": ""}
+    except httpx.HTTPStatusError as e:
+        return error_response(e, e.response)
+    except httpx.RequestError as e:
+        return error_response(e)
+    except OSError as e:
+        if e.filename == part_path:  # Report the path the caller asked for
+            e = type(e)(e.errno, e.strerror, save_path)
+        return error_response(e)
+    except Exception as e:
+        logger.exception(f"Unexpected error downloading {url} to {save_path}")
+        return error_response(e)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(part_path)
+
+# orjson turns integers outside the 64 bit range into floats, those need at least 19 digits
+_LONG_NUMBER = re.compile(rb'\d{19}')
+
+def parse_json(raw: bytes):
+    # orjson is several times faster than json but rejects a UTF-8 BOM, loses precision on huge integers
+    # and only accepts UTF-8, so json handles whatever it can't decode exactly
+    raw = raw.removeprefix(codecs.BOM_UTF8)
+    if not _LONG_NUMBER.search(raw):
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+def raw_json_text(response: httpx.Response) -> str:
+    # Only bodies that look like a JSON document are passed through, anything else (e.g. the single
+    # space old Rails versions send for `head :ok`) is handled by the normal decoding path
+    if not response.headers.get('content-type', '').startswith('application/json'):
+        return None
+    raw = response.content.removeprefix(codecs.BOM_UTF8).strip()
+    if raw[:1] not in (b'{', b'['):
+        return None
+    try:
+        return raw.decode()
+    except UnicodeDecodeError:
+        return None
+
+def error_response(e: Exception, response: httpx.Response = None) -> dict:
+    status_code, body = 0, None
+    if response is not None:
+        status_code = response.status_code
+        try:
+            body = parse_json(response.content)
+        except ValueError:
+            body = response.text
+
+    return {"status_code": status_code, "body": body, "error": f"{e.__class__.__name__}: {e}"}
+
+async def iter_file(f):
+    while chunk := await f.read(CHUNK_SIZE):
+        yield chunk
+
+def get_header(headers: list, name: bytes) -> bytes:
+    # ASGI headers are (name, value) byte pairs with lowercased names
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
 
-        return {"status_code": status_code, "body": body, "error": f"{e.__class__.__name__}: {e}"}
-        
 def yd(obj):
     # Allow direct Unicode output, prevent line wrapping for long lines, and avoid automatic key sorting.
-    return yaml.safe_dump(obj, allow_unicode=True, sort_keys=False, width=4096)
+    return yaml.dump(obj, Dumper=SafeDumper, allow_unicode=True, sort_keys=False, width=4096)
+
+def _decode_bytes(o):
+    if isinstance(o, bytes):
+        return o.decode(errors='replace')
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def jd(obj):
+    # Compact JSON for clients that don't need YAML. Non-JSON response bodies (bytes) are decoded as text.
+    try:
+        return orjson.dumps(obj, default=_decode_bytes).decode()
+    except orjson.JSONEncodeError:
+        # orjson can't write integers wider than 64 bits, which parse_json keeps exact
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_decode_bytes)
+
+# The spec never changes at runtime, so the path tools' output only depends on their arguments
+@functools.lru_cache(maxsize=1)
+def paths_list_yaml() -> str:
+    return yd(list(load_spec()['paths'].keys()))
+
+@functools.lru_cache(maxsize=None)
+def path_info_yaml(path: str) -> str:
+    return yd({path: load_spec()['paths'][path]})
+
+def paths_info_yaml(path_templates) -> str:
+    # Single key block mappings concatenate into the same YAML as dumping them as one mapping
+    paths = load_spec()['paths']
+    return "".join(path_info_yaml(path) for path in path_templates if path in paths) or yd({})
 
 
 class AuthenticatedFastMCP(FastMCP):
     def streamable_http_app(self):
-        from starlette.middleware.base import BaseHTTPMiddleware
         from starlette.responses import PlainTextResponse
 
         app = super().streamable_http_app()
 
-        if MCP_AUTH_METHOD and MCP_AUTH_TOKEN:
-            class _AuthMiddleware(BaseHTTPMiddleware):
-                async def dispatch(self, request, call_next):
-                    method = MCP_AUTH_METHOD.lower()
-                    if method == "bearer":
-                        auth_header = request.headers.get("authorization")
-                        if not auth_header or not auth_header.startswith("Bearer "):
-                            return PlainTextResponse("Unauthorized", status_code=401)
-                        token = auth_header.split(" ", 1)[1]
-                        if token != MCP_AUTH_TOKEN:
-                            return PlainTextResponse("Unauthorized", status_code=401)
-                    elif method == "header":
-                        header_value = request.headers.get(MCP_AUTH_HEADER)
-                        if header_value != MCP_AUTH_TOKEN:
-                            return PlainTextResponse("Unauthorized", status_code=401)
-                    return await call_next(request)
-
-            app.add_middleware(_AuthMiddleware)
+        # Close the Redmine client when the HTTP app shuts down
+        session_lifespan = app.router.lifespan_context
+
+        @contextlib.asynccontextmanager
+        async def lifespan(app):
+            try:
+                async with session_lifespan(app):
+                    yield
+            finally:
+                await _CLIENT.aclose()
+
+        app.router.lifespan_context = lifespan
+
+        # Every accepted request must carry one header with one exact value, resolved once here
+        auth_method = (MCP_AUTH_METHOD or "").lower() if MCP_AUTH_TOKEN else ""
+        if auth_method == "bearer":
+            auth_key, auth_value = b"authorization", f"Bearer {MCP_AUTH_TOKEN}".encode()
+        elif auth_method == "header":
+            auth_key, auth_value = MCP_AUTH_HEADER.lower().encode(), MCP_AUTH_TOKEN.encode()
+        else:
+            if auth_method:
+                logger.warning(f"Unknown MCP_AUTH_METHOD {MCP_AUTH_METHOD!r}, authentication is disabled")
+            return app
+
+        # Plain ASGI middleware, BaseHTTPMiddleware adds a task and a Request object to every call
+        class _AuthMiddleware:
+            def __init__(self, app):
+                self.app = app
+
+            async def __call__(self, scope, receive, send):
+                if scope["type"] == "http" and get_header(scope["headers"], auth_key) != auth_value:
+                    await PlainTextResponse("Unauthorized", status_code=401)(scope, receive, send)
+                    return
+                await self.app(scope, receive, send)
+
+        app.add_middleware(_AuthMiddleware)
 
         return app
 
@@ -114,17 +309,36 @@ Make a request to the Redmine API
 
 Args:
     path: API endpoint path (e.g. '/issues.json')
-    method: HTTP method to use (default: 'get')
+    method: HTTP method to use: get, post, put, patch or delete (default: 'get')
     data: Dictionary for request body (for POST/PUT)
     params: Dictionary for query parameters
+    response_format: 'yaml' (default) or 'json'. JSON is faster to produce for large responses
 
 Returns:
-    str: YAML string containing response status code, body and error message
+    str: YAML (or JSON) string containing response status code, body and error message
 
 {}""".format(REDMINE_REQUEST_INSTRUCTIONS).strip())
     
-def redmine_request(path: str, method: str = 'get', data: dict = None, params: dict = None) -> str:
-    return yd(request(path, method=method, data=data, params=params))
+async def redmine_request(path: str, method: str = 'get', data: dict = None, params: dict = None,
+                          response_format: str = 'yaml') -> str:
+    response_format = response_format.lower()
+    if response_format not in FORMATS:
+        return yd({"status_code": 0, "body": None, "error": f"Unsupported response format: {response_format}"})
+
+    method = method.lower()
+    if method not in METHODS:
+        error = {"status_code": 0, "body": None, "error": f"Unsupported HTTP method: {method}"}
+        return jd(error) if response_format == 'json' else yd(error)
+
+    if response_format == 'yaml':
+        return yd(await request(path, method=method, data=data, params=params))
+
+    result = await request(path, method=method, data=data, params=params, raw_json=True)
+    if isinstance(result["body"], RawJSON):
+        # Splice Redmine's JSON in as is instead of decoding and re-encoding it
+        return f'{{"status_code":{result["status_code"]},"body":{result["body"]},"error":{jd(result["error"])}}}'
+
+    return jd(result)
 
 @mcp.tool()
 def redmine_paths_list() -> str:
@@ -136,7 +350,7 @@ def redmine_paths_list() -> str:
     Returns:
         str: YAML string containing a list of path templates (e.g. '/issues.json')
     """
-    return yd(list(SPEC['paths'].keys()))
+    return paths_list_yaml()
 
 @mcp.tool()
 def redmine_paths_info(path_templates: list) -> str:
@@ -148,15 +362,11 @@ def redmine_paths_info(path_templates: list) -> str:
     Returns:
         str: YAML string containing API specifications for the requested paths
     """
-    info = {}
-    for path in path_templates:
-        if path in SPEC['paths']:
-            info[path] = SPEC['paths'][path]
-
-    return yd(info)
+    # Drop duplicates up front, keeping the order they were asked for in
+    return paths_info_yaml(dict.fromkeys(path_templates))
 
 @mcp.tool()
-def redmine_upload(file_path: str, description: str = None) -> str:
+async def redmine_upload(file_path: str, description: str = None) -> str:
     """
     Upload a file to Redmine and get a token for attachment
     
@@ -169,25 +379,31 @@ def redmine_upload(file_path: str, description: str = None) -> str:
              The body contains the attachment token
     """
     try:
-        path = pathlib.Path(file_path).expanduser()
-        assert path.is_absolute(), f"Path must be fully qualified, got: {file_path}"
-        assert path.exists(), f"File does not exist: {file_path}"
+        path = os.path.expanduser(file_path)
+        assert os.path.isabs(path), f"Path must be fully qualified, got: {file_path}"
+        try:
+            st = os.stat(path)  # One syscall for existence, type and the Content-Length below
+        except FileNotFoundError:
+            raise AssertionError(f"File does not exist: {file_path}") from None
+        assert stat.S_ISREG(st.st_mode), f"Path must be a regular file, got: {file_path}"
 
-        params = {'filename': path.name}
+        params = {'filename': os.path.basename(path)}
         if description:
             params['description'] = description
 
-        with open(path, 'rb') as f:
-            file_content = f.read()
-
-        result = request(path='uploads.json', method='post', params=params,
-                         content_type='application/octet-stream', content=file_content)
+        # Opened before the request so an unreadable file is reported here, not from inside httpx,
+        # and the body generator is closed even if the request fails before consuming it
+        async with await anyio.open_file(path, 'rb') as f, contextlib.aclosing(iter_file(f)) as body:
+            # Stream the file with an explicit length so Redmine doesn't get a chunked upload
+            result = await request(path='uploads.json', method='post', params=params,
+                                   content_type='application/octet-stream', content=body,
+                                   extra_headers={'Content-Length': str(st.st_size)})
         return yd(result)
     except Exception as e:
         return yd({"status_code": 0, "body": None, "error": f"{e.__class__.__name__}: {e}"})
 
 @mcp.tool()
-def redmine_download(attachment_id: int, save_path: str, filename: str = None) -> str:
+async def redmine_download(attachment_id: int, save_path: str, filename: str = None) -> str:
     """
     Download an attachment from Redmine and save it to a local file
     
@@ -201,35 +417,110 @@ def redmine_download(attachment_id: int, save_path: str, filename: str = None) -
         str: YAML string containing download status, file path, and any error messages
     """
     try:
-        path = pathlib.Path(save_path).expanduser()
-        assert path.is_absolute(), f"Path must be fully qualified, got: {save_path}"
-        assert not path.is_dir(), f"Path can't be a directory, got: {save_path}"
+        path = os.path.expanduser(save_path)
+        assert os.path.isabs(path), f"Path must be fully qualified, got: {save_path}"
+        assert not os.path.isdir(path), f"Path can't be a directory, got: {save_path}"
 
         if not filename:
-            attachment_response = request(f"attachments/{attachment_id}.json", "get")
+            attachment_response = await request(f"attachments/{attachment_id}.json", "get")
             if attachment_response["status_code"] != 200:
                 return yd(attachment_response)
 
             filename = attachment_response["body"]["attachment"]["filename"]
 
-        response = request(f"attachments/download/{attachment_id}/{filename}", "get",
-                           content_type="application/octet-stream")
-        if response["status_code"] != 200 or not response["body"]:
+        response = await download(f"attachments/download/{attachment_id}/{filename}", path)
+        if response["error"]:
             return yd(response)
 
-        with open(path, 'wb') as f:
-            f.write(response["body"])
-
-        return yd({"status_code": 200, "body": {"saved_to": str(path), "filename": filename}, "error": ""})
+        return yd({"status_code": 200, "body": {"saved_to": path, "filename": filename}, "error": ""})
     except Exception as e:
         return yd({"status_code": 0, "body": None, "error": f"{e.__class__.__name__}: {e}"})
 
+def run_workers(workers: int):
+    """Serve from several forked processes sharing one listening socket."""
+    import uvicorn
+
+    # A client's requests can land on any worker, so no session state may live in one of them
+    mcp.settings.stateless_http = True
+    app = mcp.streamable_http_app()
+
+    # Load and render the spec once here so the workers inherit it copy-on-write instead of each
+    # parsing it, and freeze it so the garbage collector doesn't dirty those shared pages
+    for path in load_spec()['paths']:
+        path_info_yaml(path)
+    paths_list_yaml()
+    gc.freeze()
+
+    sock = socket.create_server((mcp.settings.host, mcp.settings.port))
+    config = uvicorn.Config(app, host=mcp.settings.host, port=mcp.settings.port,
+                            log_level=mcp.settings.log_level.lower())
+
+    def start_worker():
+        pid = os.fork()
+        if pid == 0:
+            # Drop the handlers inherited from this process, uvicorn installs its own while serving
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            server = uvicorn.Server(config)
+            try:
+                server.run(sockets=[sock])
+            except BaseException:
+                logger.exception("Worker crashed")
+                os._exit(1)
+            os._exit(0 if server.started else WORKER_STARTUP_FAILED)
+        return pid
+
+    pids = {start_worker() for _ in range(workers)}
+    logger.info(f"Started {workers} workers: {sorted(pids)}")
+
+    # Ctrl-C reaches the workers through the process group, but SIGTERM (e.g. docker stop) or a SIGINT
+    # sent to this process only reaches us. Workers get SIGTERM either way, a second SIGINT would
+    # make uvicorn skip its graceful shutdown.
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    exit_code = 0
+    while pids:
+        pid, status = os.wait()
+        pids.discard(pid)
+        code = os.waitstatus_to_exitcode(status)
+        # uvicorn re-raises the signal it shut down on, so a worker we stopped ends with -SIGTERM/-SIGINT
+        if stopping and code in (0, -signal.SIGTERM, -signal.SIGINT):
+            logger.info(f"Worker {pid} stopped")
+            continue
+
+        exit_code = 1
+        reason = f"killed by signal {-code}" if code < 0 else f"exited with status {code}"
+        if stopping or code == WORKER_STARTUP_FAILED:
+            logger.error(f"Worker {pid} {reason}")
+        else:
+            pids.add(start_worker())
+            logger.error(f"Worker {pid} {reason}, started a replacement")
+
+    sock.close()
+    return exit_code
+
 def main():
     """Main entry point for the mcp-redmine package."""
     port = int(os.environ.get("PORT", 8369))
+    workers = int(os.environ.get("WORKERS", 1))
     mcp.settings.host = "0.0.0.0"
     mcp.settings.port = port
-    mcp.run(transport="streamable-http")
+    if workers > 1 and hasattr(os, "fork"):
+        sys.exit(run_workers(workers))
+    else:
+        if workers > 1:
+            logger.warning("WORKERS needs os.fork(), which this platform lacks, running a single process")
+        mcp.run(transport="streamable-http")
 
 if __name__ == "__main__":
     main()
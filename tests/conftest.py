@@ -0,0 +1,5 @@
+import os
+
+# server.py reads these at import time
+os.environ.setdefault("REDMINE_URL", "http://redmine.invalid/")
+os.environ.setdefault("REDMINE_API_KEY", "test-key")
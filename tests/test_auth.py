@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from mcp_redmine import server
+
+TOKEN = "s3cret"
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+               "clientInfo": {"name": "test", "version": "0"}},
+}
+
+
+@pytest.fixture
+def client(monkeypatch, request):
+    method, header = request.param
+    monkeypatch.setattr(server, "MCP_AUTH_METHOD", method)
+    monkeypatch.setattr(server, "MCP_AUTH_TOKEN", TOKEN)
+    monkeypatch.setattr(server, "MCP_AUTH_HEADER", header)
+    # The lifespan closes the Redmine client and a session manager only runs once, so start fresh
+    monkeypatch.setattr(server, "_CLIENT", httpx.AsyncClient(base_url=server.REDMINE_URL))
+    monkeypatch.setattr(server.mcp, "_session_manager", None)
+
+    with TestClient(server.mcp.streamable_http_app()) as client:
+        yield client
+
+
+def post(client, headers):
+    headers = {"Accept": "application/json, text/event-stream", **headers}
+    return client.post("/mcp", json=INITIALIZE, headers=headers)
+
+
+@pytest.mark.parametrize("client", [("bearer", "X-API-Key")], indirect=True)
+@pytest.mark.parametrize("headers, status_code", [
+    ({}, 401),
+    ({"Authorization": "Bearer wrong"}, 401),
+    ({"Authorization": f"bearer {TOKEN}"}, 401),
+    ({"Authorization": TOKEN}, 401),
+    ({"X-API-Key": TOKEN}, 401),
+    ({"Authorization": f"Bearer {TOKEN}"}, 200),
+])
+def test_bearer(client, headers, status_code):
+    assert post(client, headers).status_code == status_code
+
+
+@pytest.mark.parametrize("client", [("header", "X-API-Key")], indirect=True)
+@pytest.mark.parametrize("headers, status_code", [
+    ({}, 401),
+    ({"X-API-Key": "wrong"}, 401),
+    ({"X-API-Key": f"bearer {TOKEN}"}, 401),
+    ({"Authorization": f"Bearer {TOKEN}"}, 401),
+    ({"X-API-Key": TOKEN}, 200),
+    ({"x-api-key": TOKEN}, 200),  # Header names are case-insensitive
+])
+def test_header(client, headers, status_code):
+    assert post(client, headers).status_code == status_code
+
+
+@pytest.mark.parametrize("client", [("HEADER", "X-API-Key")], indirect=True)
+def test_method_is_case_insensitive(client):
+    assert post(client, {}).status_code == 401
+    assert post(client, {"X-API-Key": TOKEN}).status_code == 200
+
+
+@pytest.mark.parametrize("client", [("basic", "X-API-Key")], indirect=True)
+def test_unknown_method_disables_auth(client):
+    assert post(client, {}).status_code == 200